@@ -1,9 +1,16 @@
 # Example Usage
+import logging
 from core import Agent, Message, Role
 from tools.detect_bounding_box import DetectBoundingBox
 from tools.draw_bounding_box import DrawBoundingBox
 from prompt.system_prompt import SYSTEM_PROMPT
 
+# Inputs that end the chat session
+EXIT_COMMANDS = frozenset({"exit", "quit", "bye"})
+
+# Packages whose progress messages are shown on the console
+APP_LOGGERS = ("core", "providers", "tools", "utils")
+
 def chat():
     """
     Basic chatbot interface.
@@ -14,7 +21,8 @@ def chat():
     
     agent = Agent(
         tools=[detect_bbox_tool, draw_bbox_tool],
-        system_prompt=SYSTEM_PROMPT
+        system_prompt=SYSTEM_PROMPT,
+        json_output=True
     )
     
     print("Chatbot initialized. Type 'exit' to quit.\n")
@@ -22,7 +30,7 @@ def chat():
     try:
         while True:
             user_input = input("You: ")
-            if user_input.lower() in ["exit", "quit", "bye"]:
+            if user_input.lower() in EXIT_COMMANDS:
                 print("Goodbye!")
                 break
             
@@ -45,4 +53,9 @@ def chat():
 
 
 if __name__ == "__main__":
+    # Show agent and tool progress messages on the console; other libraries (such as
+    # the Google SDK) keep the default WARNING level
+    logging.basicConfig(format="%(message)s")
+    for logger_name in APP_LOGGERS:
+        logging.getLogger(logger_name).setLevel(logging.INFO)
     chat()
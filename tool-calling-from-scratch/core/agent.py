@@ -1,15 +1,31 @@
-from typing import List, Optional, Any
-import json
+from typing import Dict, List, Optional, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import logging
 from .tool import Tool, ToolUse
 from .models import Message, Role, AssistantResponse, ResponseType
 from providers.base import ModelProvider
 from providers.factory import create_model_provider
 from utils.conversation_logger import ConversationLogger
 from utils.request_context import generate_request_id, set_request_id, get_request_id
+from utils.json_codec import json_loads, json_dumps
+
+_log = logging.getLogger(__name__)
+
+# Upper bound on tools executed concurrently from a single response
+MAX_TOOL_WORKERS = 8
 
 
 class Agent:
-    def __init__(self, tools: List[Tool] = None, system_prompt: Optional[str] = None, client: str = 'gemini'):
+    def __init__(
+        self,
+        tools: List[Tool] = None,
+        system_prompt: Optional[str] = None,
+        client: str = 'gemini',
+        model_name: Optional[str] = None,
+        json_output: bool = False,
+        max_output_tokens: Optional[int] = None
+    ):
         """
         Initialize the Agent.
         
@@ -17,17 +33,27 @@ class Agent:
             tools: List of Tool objects available to the agent
             system_prompt: Optional system prompt for the agent
             client: Name of the model provider client to use (default: 'gemini')
+            model_name: Optional model for the agent's own calls, e.g. a smaller, faster model
+                for routing tool calls. If None, the provider's default model is used.
+            json_output: Whether to request JSON-only output from the model. Enable this when
+                the system prompt asks for the JSON response format (like SYSTEM_PROMPT).
+            max_output_tokens: Optional cap on tokens generated per agent turn. If None, the
+                provider's default limit applies.
             
         Note:
             Each model provider will automatically fetch its API key from the appropriate
             environment variable (e.g., GEMINI_API_KEY for Gemini).
         """
-        self.tools = tools or []
         self.system_prompt = system_prompt
+        self.json_output = json_output
+        self.max_output_tokens = max_output_tokens
+        self.tools = tools
+        
         self.conversation_history: List[Message] = []
         
         # Initialize model provider (each provider handles its own API key from env vars)
-        self.llm_client: ModelProvider = create_model_provider(client=client)
+        provider_kwargs = {'model_name': model_name} if model_name else {}
+        self.llm_client: ModelProvider = create_model_provider(client=client, **provider_kwargs)
         
         # Initialize conversation logger
         self.logger = ConversationLogger()
@@ -37,6 +63,37 @@ class Agent:
             system_message = Message(role=Role.SYSTEM, content=system_prompt)
             self.conversation_history.append(system_message)
     
+    @property
+    def tools(self) -> Tuple[Tool, ...]:
+        """
+        Tools available to the agent.
+        
+        Stored as a tuple so the name index and tools description can't go stale; assign
+        a new list or call add_tool() to change them.
+        """
+        return self._tools
+    
+    @tools.setter
+    def tools(self, tools: Optional[List[Tool]]):
+        self._tools = tuple(tools or ())
+        # Index tools by name so lookups during execution are O(1); the first tool
+        # registered under a name wins, matching the previous linear search
+        self._tools_by_name: Dict[str, Tool] = {}
+        for tool in self._tools:
+            self._tools_by_name.setdefault(tool.name, tool)
+        # The tools description is sent with every model call and only depends on the
+        # tools, so it is built here instead of on every iteration
+        self._tools_description = self._build_tools_description()
+    
+    def add_tool(self, tool: Tool):
+        """
+        Make another tool available to the agent.
+        
+        Args:
+            tool: Tool to add
+        """
+        self.tools = self._tools + (tool,)
+    
     def run(self, messages: List[Message], max_iterations: int = 10) -> Message:
         """
         Process messages and generate a response.
@@ -53,7 +110,7 @@ class Agent:
         request_id = generate_request_id()
         set_request_id(request_id)
         
-        print(f"[Request {request_id}] Agent run started with {len(messages)} message(s)")
+        _log.info("[Request %s] Agent run started with %d message(s)", request_id, len(messages))
         
         # Start a new conversation if this is the first run
         if not self.logger.current_conversation_id:
@@ -69,9 +126,8 @@ class Agent:
         # Update conversation history with new messages
         self.conversation_history.extend(messages)
         
-        # Get the last user message
-        user_messages = [msg for msg in messages if msg.role == Role.USER]
-        if not user_messages:
+        # Make sure at least one user message was provided
+        if not any(msg.role == Role.USER for msg in messages):
             return Message(role=Role.ASSISTANT, content="I didn't receive any user messages.")
         
         # Loop until we get a text response (automatic tool chaining)
@@ -79,7 +135,7 @@ class Agent:
         while iteration < max_iterations:
             iteration += 1
             
-            print(f"[Request {request_id}] Iteration {iteration}/{max_iterations}")
+            _log.info("[Request %s] Iteration %d/%d", request_id, iteration, max_iterations)
             
             # Generate response based on current conversation history
             assistant_response = self._generate_response_from_history()
@@ -93,26 +149,29 @@ class Agent:
                 response = Message(role=Role.ASSISTANT, content=assistant_response.text)
                 self.conversation_history.append(response)
                 self.logger.log_message(response)
-                print(f"[Request {request_id}] Agent run completed successfully after {iteration} iteration(s)")
+                _log.info("[Request %s] Agent run completed successfully after %d iteration(s)", request_id, iteration)
                 return response
                 
             elif assistant_response.is_tool_use():
                 # Execute all tools and collect results
                 tool_results = []
-                print(f"[Request {request_id}] Executing {len(assistant_response.tool_uses)} tool(s)")
-                for tool_use in assistant_response.tool_uses:
-                    try:
-                        result = self.execute_tool(tool_use)
+                tool_uses = assistant_response.tool_uses
+                _log.info("[Request %s] Executing %d tool(s)", request_id, len(tool_uses))
+                outcomes = self._execute_tools(tool_uses)
+                for tool_use, (result, error) in zip(tool_uses, outcomes):
+                    if error is None:
+                        # Convert the result to plain data once; the prompt text and the log both use it
+                        result_data = self._to_result_data(result)
                         # Format result in a way that's easy for LLM to parse and reuse
-                        formatted_result = self._format_tool_result(result)
+                        formatted_result = self._format_tool_result(result_data)
                         tool_results.append(f"{tool_use.name}: {formatted_result}")
                         # Log successful tool execution
-                        self.logger.log_tool_execution(tool_use, result)
-                    except Exception as e:
-                        tool_results.append(f"{tool_use.name}: Error - {str(e)}")
-                        print(f"[Request {request_id}] Tool execution failed: {tool_use.name} - {str(e)}")
+                        self.logger.log_tool_execution(tool_use, result_data)
+                    else:
+                        tool_results.append(f"{tool_use.name}: Error - {error}")
+                        _log.warning("[Request %s] Tool execution failed: %s - %s", request_id, tool_use.name, error)
                         # Log failed tool execution
-                        self.logger.log_tool_execution(tool_use, None, error=str(e))
+                        self.logger.log_tool_execution(tool_use, None, error=error)
                 
                 # Format tool execution results into a message and add to conversation history
                 # This allows the LLM to see the results and potentially make more tool calls
@@ -131,7 +190,7 @@ class Agent:
                 return response
         
         # If we've exceeded max iterations, return an error message
-        print(f"[Request {request_id}] Maximum iterations ({max_iterations}) reached")
+        _log.warning("[Request %s] Maximum iterations (%d) reached", request_id, max_iterations)
         error_msg = Message(
             role=Role.ASSISTANT, 
             content=f"Maximum tool execution iterations ({max_iterations}) reached. The agent may be stuck in a loop."
@@ -140,29 +199,35 @@ class Agent:
         self.logger.log_message(error_msg)
         return error_msg
     
+    def _build_tools_description(self) -> Optional[str]:
+        """
+        Build the tools description for the prompt using full tool prompts.
+        
+        Returns:
+            Description of all tools, or None if the agent has no tools
+        """
+        if not self.tools:
+            return None
+        tool_descriptions = []
+        for tool in self.tools:
+            # Use get_prompt_for_orchestrator() if available for detailed format examples, otherwise fall back to basic description
+            if hasattr(tool, 'get_prompt_for_orchestrator'):
+                tool_descriptions.append(tool.get_prompt_for_orchestrator())
+            else:
+                # Fallback to basic description if get_prompt_for_orchestrator() is not available
+                tool_desc = f"- {tool.name}: {tool.description}"
+                if tool.parameters:
+                    params_desc = ", ".join([f"{name}" for name in tool.parameters.keys()])
+                    tool_desc += f" (parameters: {params_desc})"
+                tool_descriptions.append(tool_desc)
+        return "\n\n".join(tool_descriptions)
+    
     def _generate_response_from_history(self) -> AssistantResponse:
         """
         Generate a response based on the current conversation history.
         Returns an AssistantResponse which can be either text or tool use.
         The response from Gemini is parsed deterministically to extract tool calls or text.
         """
-        # Build tools description for the prompt using full tool prompts
-        tools_description = None
-        if self.tools:
-            tool_descriptions = []
-            for tool in self.tools:
-                # Use get_prompt_for_orchestrator() if available for detailed format examples, otherwise fall back to basic description
-                if hasattr(tool, 'get_prompt_for_orchestrator'):
-                    tool_descriptions.append(tool.get_prompt_for_orchestrator())
-                else:
-                    # Fallback to basic description if get_prompt_for_orchestrator() is not available
-                    tool_desc = f"- {tool.name}: {tool.description}"
-                    if tool.parameters:
-                        params_desc = ", ".join([f"{name}" for name in tool.parameters.keys()])
-                        tool_desc += f" (parameters: {params_desc})"
-                    tool_descriptions.append(tool_desc)
-            tools_description = "\n\n".join(tool_descriptions)
-        
         # Get the last message content for the LLM client
         # If the last message is an assistant message (tool results), we want to continue from there
         last_message = self.conversation_history[-1] if self.conversation_history else None
@@ -178,7 +243,9 @@ class Agent:
             response_text = self.llm_client.generate_response(
                 messages=self.conversation_history,
                 system_prompt=self.system_prompt,
-                tools_description=tools_description
+                tools_description=self._tools_description,
+                json_output=self.json_output,
+                max_output_tokens=self.max_output_tokens
             )
         except Exception as e:
             return AssistantResponse.text_response(f"Error calling LLM API: {str(e)}")
@@ -195,29 +262,14 @@ class Agent:
         Returns an AssistantResponse which can be either text or tool use.
         The response from Gemini is parsed deterministically to extract tool calls or text.
         """
-        # Build tools description for the prompt using full tool prompts
-        tools_description = None
-        if self.tools:
-            tool_descriptions = []
-            for tool in self.tools:
-                # Use get_prompt_for_orchestrator() if available for detailed format examples, otherwise fall back to basic description
-                if hasattr(tool, 'get_prompt_for_orchestrator'):
-                    tool_descriptions.append(tool.get_prompt_for_orchestrator())
-                else:
-                    # Fallback to basic description if get_prompt_for_orchestrator() is not available
-                    tool_desc = f"- {tool.name}: {tool.description}"
-                    if tool.parameters:
-                        params_desc = ", ".join([f"{name}" for name in tool.parameters.keys()])
-                        tool_desc += f" (parameters: {params_desc})"
-                    tool_descriptions.append(tool_desc)
-            tools_description = "\n\n".join(tool_descriptions)
-        
         # Call LLM client
         try:
             response_text = self.llm_client.generate_response(
                 messages=self.conversation_history,
                 system_prompt=self.system_prompt,
-                tools_description=tools_description
+                tools_description=self._tools_description,
+                json_output=self.json_output,
+                max_output_tokens=self.max_output_tokens
             )
         except Exception as e:
             return AssistantResponse.text_response(f"Error calling LLM API: {str(e)}")
@@ -233,23 +285,27 @@ class Agent:
           - {"type": "tool_use", "tool_uses": [{"name": "...", "params": {...}, "partial": false}]}
         Falls back to returning the raw text if parsing fails.
         """
-        import json
-        import re
-
         def try_load_json(text: str):
             try:
-                return json.loads(text)
+                return json_loads(text)
             except Exception:
                 return None
 
+        # A response without an opening brace can't contain a JSON object, so skip
+        # the parse attempts below and treat it as plain text straight away
+        if '{' not in response_text:
+            return AssistantResponse.text_response(response_text.strip())
+
         # First attempt: direct JSON parsing of the whole response
         data = try_load_json(response_text.strip())
 
-        # Second attempt: extract the first JSON object substring
+        # Second attempt: extract the span from the first '{' to the last '}'
+        # (plain index scans; equivalent to a greedy \{[\s\S]*\} regex match)
         if data is None:
-            match = re.search(r'\{[\s\S]*\}', response_text)
-            if match:
-                data = try_load_json(match.group(0))
+            start = response_text.find('{')
+            end = response_text.rfind('}')
+            if end > start:
+                data = try_load_json(response_text[start:end + 1])
 
         # If still no JSON, treat as plain text
         if data is None or not isinstance(data, dict):
@@ -370,12 +426,33 @@ class Agent:
             system_message = Message(role=Role.SYSTEM, content=self.system_prompt)
             self.conversation_history.append(system_message)
     
+    def _to_result_data(self, result: Any) -> Any:
+        """
+        Convert a structured tool result to plain data via its to_dict() method.
+        
+        Args:
+            result: The result from tool execution
+            
+        Returns:
+            The to_dict() output, or the result unchanged if it has no to_dict() or it fails
+        """
+        if hasattr(result, 'to_dict'):
+            try:
+                return result.to_dict()
+            except Exception:
+                return result
+        return result
+    
     def _format_tool_result(self, result: Any) -> str:
         """
         Format a tool result in a way that's easy for the LLM to parse and reuse.
-        For structured objects with to_dict(), formats as JSON.
+        For structured objects with to_dict(), formats as compact JSON.
         For other types, uses string representation.
         
+        Tool results stay in the conversation history and are sent back to the
+        model on every following turn, so whitespace is dropped to keep the
+        prompt small.
+        
         Args:
             result: The result from tool execution
             
@@ -386,7 +463,7 @@ class Agent:
         if hasattr(result, 'to_dict'):
             try:
                 result_dict = result.to_dict()
-                return json.dumps(result_dict, indent=2)
+                return json_dumps(result_dict)
             except Exception:
                 # Fall back to string representation if to_dict() fails
                 return str(result)
@@ -394,13 +471,45 @@ class Agent:
         # For dicts and lists, format as JSON
         if isinstance(result, (dict, list)):
             try:
-                return json.dumps(result, indent=2)
+                return json_dumps(result)
             except Exception:
                 return str(result)
         
         # For other types, use string representation
         return str(result)
     
+    def _execute_tools(self, tool_uses: List[ToolUse]) -> List[Tuple[Any, Optional[str]]]:
+        """
+        Execute the tool uses from a single response and collect their outcomes.
+        
+        Tool uses emitted together in one response cannot depend on each other's
+        results, so they are run concurrently when there is more than one.
+        Each tool runs in a copy of the current context so the request ID
+        remains visible inside worker threads.
+        
+        Args:
+            tool_uses: ToolUse objects from a single assistant response
+            
+        Returns:
+            List of (result, error) tuples in the same order as tool_uses.
+            error is None on success; result is None on failure.
+        """
+        def run_one(tool_use: ToolUse) -> Tuple[Any, Optional[str]]:
+            try:
+                return self.execute_tool(tool_use), None
+            except Exception as e:
+                return None, str(e)
+        
+        if len(tool_uses) == 1:
+            return [run_one(tool_uses[0])]
+        
+        with ThreadPoolExecutor(max_workers=min(MAX_TOOL_WORKERS, len(tool_uses))) as executor:
+            futures = [
+                executor.submit(contextvars.copy_context().run, run_one, tool_use)
+                for tool_use in tool_uses
+            ]
+            return [future.result() for future in futures]
+    
     def execute_tool(self, tool_use: ToolUse) -> Any:
         """
         Execute a tool using a ToolUse object.
@@ -415,7 +524,7 @@ class Agent:
             ValueError: If the tool is not found in the agent's tool list
         """
         # Find the tool by name
-        tool = next((t for t in self.tools if t.name == tool_use.name), None)
+        tool = self._tools_by_name.get(tool_use.name)
         if tool is None:
             raise ValueError(f"Tool '{tool_use.name}' not found in agent's tool list")
         
@@ -22,6 +22,8 @@ class ResponseType(Enum):
 class Message:
     """Represents a message in the conversation."""
     
+    __slots__ = ("role", "content", "image_path")
+    
     def __init__(self, role: Role, content: str, image_path: Optional[str] = None):
         """
         Initialize a Message.
@@ -19,7 +19,9 @@ class ModelProvider(ABC):
         self,
         messages: List["Message"],
         system_prompt: Optional[str] = None,
-        tools_description: Optional[str] = None
+        tools_description: Optional[str] = None,
+        json_output: bool = False,
+        max_output_tokens: Optional[int] = None
     ) -> str:
         """
         Generate a response from the LLM based on conversation history.
@@ -28,6 +30,10 @@ class ModelProvider(ABC):
             messages: List of Message objects representing the conversation history.
             system_prompt: Optional system prompt to include.
             tools_description: Optional description of available tools to include in the prompt.
+            json_output: If True, constrain the model to emit a JSON document (when the
+                provider supports it), so the reply needs no markdown or prose stripping.
+            max_output_tokens: Optional cap on the number of tokens the model may generate.
+                If None, the provider's default limit applies.
             
         Returns:
             Raw text response from the LLM that should be parsed deterministically.
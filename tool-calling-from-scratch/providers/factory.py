@@ -1,30 +1,43 @@
 """
 Factory function for creating ModelProvider instances.
 """
+from typing import Dict, Tuple
 from .base import ModelProvider
 from .gemini import GeminiModelProvider
 
+# Providers keep no per-conversation state (each call starts a fresh chat session),
+# so one instance per (client, model) is shared by every caller in the process
+_provider_cache: Dict[Tuple[str, str], ModelProvider] = {}
+
 
 def create_model_provider(client: str, **kwargs) -> ModelProvider:
     """
     Factory function to create a ModelProvider instance based on the client name.
     
+    Providers are cached per client and model name, so the agent and its tools
+    share a single configured client instead of each building their own.
+    
     Args:
         client: Name of the client to use (e.g., 'gemini')
         **kwargs: Additional provider-specific arguments (e.g., model_name for Gemini)
-        
+    
     Returns:
         ModelProvider instance
-        
+    
     Raises:
         ValueError: If the client name is not supported
-        
+    
     Note:
         Each provider will automatically fetch its API key from the appropriate
         environment variable (e.g., GEMINI_API_KEY for Gemini).
     """
     if client.lower() == 'gemini':
         model_name = kwargs.get('model_name', 'gemini-3-flash-preview')
-        return GeminiModelProvider(model_name=model_name)
+        cache_key = ('gemini', model_name)
+        provider = _provider_cache.get(cache_key)
+        if provider is None:
+            provider = GeminiModelProvider(model_name=model_name)
+            _provider_cache[cache_key] = provider
+        return provider
     else:
         raise ValueError(f"Unsupported client: {client}. Supported clients: 'gemini'")
@@ -1,9 +1,11 @@
 """
 Gemini API client and model provider implementation.
 """
+import io
+import logging
 import os
-from typing import List, Optional, TYPE_CHECKING
-import google.generativeai as genai
+import threading
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 from PIL import Image
 from utils.request_context import get_request_id
 
@@ -15,10 +17,19 @@ except ImportError:
     pass  # python-dotenv not installed, will use environment variables only
 
 if TYPE_CHECKING:
+    import google.generativeai as genai
     from core.models import Message, Role
 
 from .base import ModelProvider
 
+logger = logging.getLogger(__name__)
+
+# API key the SDK's process-wide configuration was last set with
+_configured_api_key: Optional[str] = None
+
+# Maximum number of image parts kept per client
+MAX_CACHED_IMAGES = 16
+
 
 class GeminiClient:
     """
@@ -38,14 +49,96 @@ class GeminiClient:
         if not api_key:
             raise ValueError("GEMINI_API_KEY must be provided either as parameter or environment variable")
         
-        genai.configure(api_key=api_key)
+        # Import here so importing this module (and the agent/tools that depend on it)
+        # doesn't pay the SDK's import cost until a client is actually created
+        import google.generativeai as genai
+        
+        # genai.configure() sets process-wide state, so only redo it when the key changes
+        global _configured_api_key
+        if api_key != _configured_api_key:
+            genai.configure(api_key=api_key)
+            _configured_api_key = api_key
+        self.model_name = model_name
         self.model = genai.GenerativeModel(model_name)
+        # Models configured with a system instruction, keyed by that instruction
+        self._models_by_instruction: Dict[str, "genai.GenerativeModel"] = {}
+        # Image parts keyed by (path, mtime_ns, size), so images that stay in the
+        # conversation history aren't reopened and reread on every turn
+        self._image_parts: Dict[Tuple[str, int, int], Any] = {}
+        # The client is shared by the agent and its tools, which run on a thread pool
+        self._image_parts_lock = threading.Lock()
+    
+    def _get_model(self, system_instruction: Optional[str]) -> "genai.GenerativeModel":
+        """
+        Get a model configured with the given system instruction.
+        
+        Models are reused per instruction, so every call with the same system prompt
+        and tools sends a byte-identical prefix that the API can cache implicitly.
+        
+        Args:
+            system_instruction: System instruction text, or None for the plain model.
+            
+        Returns:
+            GenerativeModel instance
+        """
+        if not system_instruction:
+            return self.model
+        model = self._models_by_instruction.get(system_instruction)
+        if model is None:
+            import google.generativeai as genai
+            model = genai.GenerativeModel(self.model_name, system_instruction=system_instruction)
+            self._models_by_instruction[system_instruction] = model
+        return model
+    
+    def _load_image_part(self, image_path: str) -> Any:
+        """
+        Load an image file as a message part, reusing earlier loads of the same file.
+        
+        File-based images are sent as their original bytes with the format's MIME type
+        (which is what the SDK does for an image opened from a file).
+        
+        Args:
+            image_path: Local path to the image file.
+            
+        Returns:
+            A {"mime_type", "data"} blob dict, or a PIL image if the format has no MIME type.
+            
+        Raises:
+            Exception: If the file can't be read or isn't a valid image.
+        """
+        stat_result = os.stat(image_path)
+        cache_key = (os.path.abspath(image_path), stat_result.st_mtime_ns, stat_result.st_size)
+        with self._image_parts_lock:
+            image_part = self._image_parts.get(cache_key)
+        if image_part is not None:
+            return image_part
+        
+        # Read the file once and identify the format from the bytes already in memory
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        with Image.open(io.BytesIO(data)) as image:
+            mime_type = image.get_format_mimetype()
+            if mime_type is None:
+                image.load()
+                image_part = image.copy()
+            else:
+                image_part = {"mime_type": mime_type, "data": data}
+        
+        # Evict the oldest entry once the cache is full. The file is read outside the
+        # lock, so another thread may have cached the same image meanwhile
+        with self._image_parts_lock:
+            if cache_key not in self._image_parts and len(self._image_parts) >= MAX_CACHED_IMAGES:
+                del self._image_parts[next(iter(self._image_parts))]
+            self._image_parts[cache_key] = image_part
+        return image_part
     
     def generate_response(
         self, 
         messages: List["Message"], 
         system_prompt: Optional[str] = None,
-        tools_description: Optional[str] = None
+        tools_description: Optional[str] = None,
+        json_output: bool = False,
+        max_output_tokens: Optional[int] = None
     ) -> str:
         """
         Generate a response from Gemini based on conversation history.
@@ -55,6 +148,10 @@ class GeminiClient:
                 Messages can optionally include images via the image_path attribute.
             system_prompt: Optional system prompt to include.
             tools_description: Optional description of available tools to include in the prompt.
+            json_output: If True, constrain the model to emit a JSON document (when the
+                provider supports it), so the reply needs no markdown or prose stripping.
+            max_output_tokens: Optional cap on the number of tokens the model may generate.
+                If None, the provider's default limit applies.
             
         Returns:
             Raw text response from Gemini that should be parsed deterministically.
@@ -65,29 +162,28 @@ class GeminiClient:
         # Convert conversation history to Gemini format
         chat_history = []
         system_content = system_prompt
+        # Track the last user message while walking the history so it doesn't need a second scan
+        last_user_message = None
         
         for msg in messages:
             if msg.role == Role.SYSTEM:
                 system_content = msg.content
             elif msg.role == Role.USER:
+                last_user_message = msg
                 parts = [msg.content]
                 # Add image if provided
                 if hasattr(msg, 'image_path') and msg.image_path:
                     try:
-                        image = Image.open(msg.image_path)
-                        parts.append(image)
+                        parts.append(self._load_image_part(msg.image_path))
                     except Exception as e:
                         # If image loading fails, continue without image
                         request_id = get_request_id()
-                        print(f"[Request {request_id}] Image failed to load: {e}")
+                        logger.warning("[Request %s] Image failed to load: %s", request_id, e)
                         pass
                 chat_history.append({"role": "user", "parts": parts})
             elif msg.role == Role.ASSISTANT:
                 chat_history.append({"role": "model", "parts": [msg.content]})
         
-        # Start a chat session with history
-        chat = self.model.start_chat(history=chat_history)
-        
         # Determine what to send as the current prompt
         # If the last message is an assistant message (tool results), we want to continue from there
         # Otherwise, use the last user message
@@ -95,56 +191,68 @@ class GeminiClient:
         if not last_message:
             raise ValueError("No messages provided")
         
+        # The message being sent is passed to send_message(), so it is taken back out of
+        # the history; otherwise its text (and image) would be sent to the model twice
+        
         # If the last message is an assistant message (tool results), use it as the prompt
         # This enables automatic tool chaining
         if last_message.role == Role.ASSISTANT:
+            chat_history.pop()
             prompt_content = last_message.content
             # For assistant messages (tool results), we don't have an image_path
             message_image = None
         else:
             # Use the last user message
-            user_messages = [msg for msg in messages if msg.role == Role.USER]
-            if not user_messages:
+            if last_user_message is None:
                 raise ValueError("No user messages provided")
             
-            last_user_message = user_messages[-1]
             prompt_content = last_user_message.content
-            # Check for image in the last user message
             message_image = None
-            if hasattr(last_user_message, 'image_path') and last_user_message.image_path:
+            if last_message is last_user_message:
+                # Reuse the parts built above, including an already loaded image
+                parts = chat_history.pop()["parts"]
+                if len(parts) > 1:
+                    message_image = parts[1]
+            elif hasattr(last_user_message, 'image_path') and last_user_message.image_path:
+                # Check for image in the last user message
                 try:
-                    message_image = Image.open(last_user_message.image_path)
+                    message_image = self._load_image_part(last_user_message.image_path)
                 except Exception as e:
                     # If image loading fails, continue without image
                     request_id = get_request_id()
-                    print(f"[Request {request_id}] Image failed to load: {e}")
+                    logger.warning("[Request %s] Image failed to load: %s", request_id, e)
                     pass
         
-        # Build the prompt with system prompt and tools description if provided
-        prompt_parts = []
+        # The system prompt and tools go in the model's system instruction rather than
+        # being prepended to the latest message, so they form a stable prefix
+        instruction_parts = []
         
         if system_content:
-            prompt_parts.append(system_content)
+            instruction_parts.append(system_content)
         
         if tools_description:
-            prompt_parts.append(f"\n\nAvailable tools:\n{tools_description}")
+            instruction_parts.append(f"\n\nAvailable tools:\n{tools_description}")
         
-        # Prepare message parts (text and optionally image)
-        message_parts = []
+        system_instruction = "\n".join(instruction_parts) if instruction_parts else None
         
-        # If we have system prompt or tools, include them in the message
-        # Otherwise just send the prompt content
-        if prompt_parts:
-            full_prompt = "\n".join(prompt_parts) + f"\n\nUser: {prompt_content}"
-            message_parts.append(full_prompt)
-        else:
-            message_parts.append(prompt_content)
+        # Prepare message parts (text and optionally image)
+        message_parts = [prompt_content]
         
         # Add image if available
         if message_image:
             message_parts.append(message_image)
         
-        response = chat.send_message(message_parts)
+        # Start a chat session with history
+        chat = self._get_model(system_instruction).start_chat(history=chat_history)
+        
+        generation_config = {}
+        if json_output:
+            # JSON mode makes Gemini return a bare JSON document instead of fenced or chatty text
+            generation_config["response_mime_type"] = "application/json"
+        if max_output_tokens is not None:
+            generation_config["max_output_tokens"] = max_output_tokens
+        
+        response = chat.send_message(message_parts, generation_config=generation_config or None)
         
         return response.text
 
@@ -173,7 +281,9 @@ class GeminiModelProvider(ModelProvider):
         self,
         messages: List["Message"],
         system_prompt: Optional[str] = None,
-        tools_description: Optional[str] = None
+        tools_description: Optional[str] = None,
+        json_output: bool = False,
+        max_output_tokens: Optional[int] = None
     ) -> str:
         """
         Generate a response using Gemini.
@@ -182,6 +292,10 @@ class GeminiModelProvider(ModelProvider):
             messages: List of Message objects representing the conversation history.
             system_prompt: Optional system prompt to include.
             tools_description: Optional description of available tools to include in the prompt.
+            json_output: If True, constrain the model to emit a JSON document (when the
+                provider supports it), so the reply needs no markdown or prose stripping.
+            max_output_tokens: Optional cap on the number of tokens the model may generate.
+                If None, the provider's default limit applies.
             
         Returns:
             Raw text response from Gemini.
@@ -189,5 +303,7 @@ class GeminiModelProvider(ModelProvider):
         return self.client.generate_response(
             messages=messages,
             system_prompt=system_prompt,
-            tools_description=tools_description
+            tools_description=tools_description,
+            json_output=json_output,
+            max_output_tokens=max_output_tokens
         )
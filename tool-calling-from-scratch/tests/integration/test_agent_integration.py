@@ -11,12 +11,14 @@ This module contains integration tests that verify:
 import pytest
 import json
 import os
+import threading
 from unittest.mock import Mock
 from core.agent import Agent
 from core.models import Message, Role
-from core.tool import ToolUse
+from core.tool import Tool, ToolUse
 from tools.detect_bounding_box import DetectBoundingBox, BoundingBoxOutput, BoundingBox
 from tools.draw_bounding_box import DrawBoundingBox, DrawBoundingBoxOutput
+from utils.request_context import get_request_id
 
 
 class TestSingleToolCallFlow:
@@ -65,6 +67,22 @@ class TestSingleToolCallFlow:
         assert len(agent_with_tools.conversation_history) >= 3  # User, tool result, final response
         assert mock_llm_provider.generate_response.call_count == 2
 
+    
+    def test_generation_options_passed_to_provider(self, mock_llm_provider):
+        """Test that the agent passes its JSON output and output token cap settings on every call."""
+        agent = Agent(tools=[], json_output=True, max_output_tokens=128)
+        agent.llm_client = mock_llm_provider
+        mock_llm_provider.generate_response.return_value = json.dumps({
+            "type": "text",
+            "text": "Hello!"
+        })
+        
+        agent.run(messages=[Message(role=Role.USER, content="Hi")])
+        
+        call_kwargs = mock_llm_provider.generate_response.call_args.kwargs
+        assert call_kwargs["json_output"] is True
+        assert call_kwargs["max_output_tokens"] == 128
+
 
 class TestToolChaining:
     """Test tool chaining (detect -> draw)."""
@@ -205,6 +223,58 @@ class TestMultipleToolsSingleResponse:
         assert "detect_bounding_box" in tool_result_messages[0].content
         # Should have results from both tool calls
         assert tool_result_messages[0].content.count("detect_bounding_box") == 2
+    
+    def test_parallel_tools_keep_order_and_request_id(self, mock_llm_provider):
+        """Test that concurrently run tools report results in request order and see the request ID."""
+        fast_done = threading.Event()
+        
+        def slow_tool():
+            # Finish only after the second tool has finished
+            assert fast_done.wait(timeout=5)
+            return f"slow:{get_request_id()}"
+        
+        def fast_tool():
+            request_id = get_request_id()
+            fast_done.set()
+            return f"fast:{request_id}"
+        
+        agent = Agent(tools=[
+            Tool(name="slow_tool", description="Finishes last", function=slow_tool),
+            Tool(name="fast_tool", description="Finishes first", function=fast_tool),
+        ])
+        agent.llm_client = mock_llm_provider
+        
+        # Mock LLM to request both tools in one response
+        mock_llm_provider.generate_response.side_effect = [
+            json.dumps({
+                "type": "tool_use",
+                "tool_uses": [
+                    {"name": "slow_tool", "params": {}},
+                    {"name": "fast_tool", "params": {}}
+                ]
+            }),
+            json.dumps({
+                "type": "text",
+                "text": "Both tools finished."
+            })
+        ]
+        
+        # Execute agent
+        user_message = Message(role=Role.USER, content="Run both tools")
+        agent.run(messages=[user_message])
+        
+        # Results are listed in request order, and both tools saw the run's request ID
+        request_id = agent.logger.current_request_id
+        assert request_id is not None
+        tool_result_messages = [
+            msg for msg in agent.conversation_history
+            if "Tool execution results" in msg.content
+        ]
+        assert len(tool_result_messages) == 1
+        assert tool_result_messages[0].content.splitlines()[1:] == [
+            f"slow_tool: slow:{request_id}",
+            f"fast_tool: fast:{request_id}"
+        ]
 
 
 class TestMultiTurnConversation:
@@ -362,6 +432,38 @@ class TestToolExecutionErrorHandling:
         assert len(tool_result_messages) == 1
         assert "Error" in tool_result_messages[0].content
         assert "not found" in tool_result_messages[0].content.lower()
+    
+    def test_tool_added_after_construction(self, agent_without_tools, mock_llm_provider):
+        """Test that a tool added with add_tool() can be called, and tools can't be mutated in place."""
+        agent_without_tools.add_tool(Tool(name="echo_tool", description="Echoes", function=lambda: "echoed"))
+        
+        # Mock LLM to call the added tool
+        mock_llm_provider.generate_response.side_effect = [
+            json.dumps({
+                "type": "tool_use",
+                "tool_uses": [{"name": "echo_tool", "params": {}}]
+            }),
+            json.dumps({
+                "type": "text",
+                "text": "Done."
+            })
+        ]
+        
+        # Execute agent
+        user_message = Message(role=Role.USER, content="Use the echo tool")
+        agent_without_tools.run(messages=[user_message])
+        
+        # Assertions
+        tool_result_messages = [
+            msg for msg in agent_without_tools.conversation_history
+            if "Tool execution results" in msg.content
+        ]
+        assert len(tool_result_messages) == 1
+        assert "echo_tool: echoed" in tool_result_messages[0].content
+        # The added tool is described to the model
+        assert "echo_tool" in mock_llm_provider.generate_response.call_args.kwargs["tools_description"]
+        with pytest.raises(AttributeError):
+            agent_without_tools.tools.append(Tool(name="other_tool", description="Other"))
 
 
 class TestMaxIterationsLimit:
@@ -7,8 +7,10 @@ This module contains critical unit tests for:
 - JSON extraction from LLM responses
 """
 
+import os
 import pytest
 from unittest.mock import Mock
+from PIL import Image
 from core.tool import ToolUse
 from tools.detect_bounding_box import (
     DetectBoundingBox,
@@ -67,11 +69,38 @@ class TestDetectBoundingBoxExtractJson:
     def test_extract_json_markdown_code_block(self, tool):
         """Test extracting JSON from markdown code block."""
         response = '```json\n{"boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2, 0.3, 0.4]}]}\n```'
-        result = tool._extract_json_from_response(response)
+        result, repaired = tool._extract_json_from_response(response)
+        assert not repaired
         assert "boxes" in result
         assert len(result["boxes"]) == 1
         assert result["boxes"][0]["confidence"] == 0.9
     
+    def test_extract_json_truncated_response(self, tool):
+        """Test that a truncated response is repaired and the partial last box is dropped."""
+        response = '{"boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2, 0.3, 0.4]}, {"confidence": 0.8, "xyxy": [0.5, 0.6'
+        result, repaired = tool._extract_json_from_response(response)
+        assert repaired
+        assert result == {"boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2, 0.3, 0.4]}]}
+    
+    @pytest.mark.parametrize("partial_box", [
+        '{"conf',
+        '{"confidence": 0.8, "xy',
+        '{"confidence": 0.8, "xyxy": [0.5, 0.',
+        '{"confidence": 0.8, "xyxy": [0.5, 0.5, 0.6, 0',
+        '{"xyxy": [0.5, 0.5, 0.6, 0.6], "confidence": 0.',
+    ])
+    def test_extract_json_truncated_mid_key_or_number(self, tool, partial_box):
+        """Test that cuts inside a key, after a key, or inside a number keep the complete boxes."""
+        response = '{"boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2, 0.3, 0.4]}, ' + partial_box
+        result, repaired = tool._extract_json_from_response(response)
+        assert repaired
+        assert result == {"boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2, 0.3, 0.4]}]}
+    
+    def test_extract_json_repaired_non_object_raises_error(self, tool):
+        """Test that a response that only repairs to a JSON array raises ValueError."""
+        with pytest.raises(ValueError, match="expected a JSON object"):
+            tool._extract_json_from_response("I could not find it [sorry")
+    
     def test_extract_json_invalid_json_raises_error(self, tool):
         """Test that invalid JSON raises ValueError."""
         response = '{"boxes": [invalid json}'
@@ -108,6 +137,33 @@ class TestDetectBoundingBoxExecute:
         assert result.boxes[0].confidence == 0.92
         assert result.boxes[0].xyxy == [0.1, 0.2, 0.3, 0.4]
     
+    def test_execute_requests_json_output(self, tool, test_image, mock_model_provider):
+        """Test that detection asks the provider for JSON-only output."""
+        image_path, _, _ = test_image
+        tool.execute(ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        ))
+        
+        assert mock_model_provider.generate_response.call_args.kwargs["json_output"] is True
+    
+    def test_execute_passes_max_output_tokens(self, test_image, mock_model_provider):
+        """Test that the output token cap is passed to the provider."""
+        image_path, _, _ = test_image
+        tool = DetectBoundingBox(model_provider=mock_model_provider, max_output_tokens=512)
+        tool.execute(ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        ))
+        
+        assert mock_model_provider.generate_response.call_args.kwargs["max_output_tokens"] == 512
+    
     def test_execute_missing_image_path(self, tool):
         """Test that missing image_path raises ValueError."""
         tool_use = ToolUse(
@@ -160,3 +216,200 @@ class TestDetectBoundingBoxExecute:
         )
         with pytest.raises(ValueError, match="Failed to parse bounding box response"):
             tool.execute(tool_use)
+
+
+class TestDetectBoundingBoxCache:
+    """Test reuse of detection results for repeated requests."""
+    
+    @pytest.fixture
+    def tool(self, mock_model_provider):
+        """Create a DetectBoundingBox instance for testing."""
+        return DetectBoundingBox(model_provider=mock_model_provider)
+    
+    def test_repeated_detection_uses_cache(self, tool, test_image, mock_model_provider):
+        """Test that the same label on the same image only calls the model once."""
+        image_path, _, _ = test_image
+        mock_model_provider.generate_response.return_value = '{"boxes": [{"confidence": 0.92, "xyxy": [0.1, 0.2, 0.3, 0.4]}]}'
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        first = tool.execute(tool_use)
+        second = tool.execute(tool_use)
+        
+        assert mock_model_provider.generate_response.call_count == 1
+        assert second.to_dict() == first.to_dict()
+        
+        # A different label is a different request
+        tool.execute(ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "icon"
+            }
+        ))
+        assert mock_model_provider.generate_response.call_count == 2
+    
+    def test_cache_disabled(self, test_image, mock_model_provider):
+        """Test that cache_results=False always calls the model."""
+        image_path, _, _ = test_image
+        tool = DetectBoundingBox(model_provider=mock_model_provider, cache_results=False)
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        tool.execute(tool_use)
+        tool.execute(tool_use)
+        
+        assert mock_model_provider.generate_response.call_count == 2
+    
+    def test_failed_detection_not_cached(self, tool, test_image, mock_model_provider):
+        """Test that a failed detection is retried on the next call."""
+        image_path, _, _ = test_image
+        mock_model_provider.generate_response.side_effect = [
+            Exception("API Error"),
+            '{"boxes": []}'
+        ]
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        with pytest.raises(RuntimeError):
+            tool.execute(tool_use)
+        result = tool.execute(tool_use)
+        
+        assert result.boxes == []
+        assert mock_model_provider.generate_response.call_count == 2
+    
+    def test_disk_cache_shared_across_instances(self, test_image, mock_model_provider, temp_dir):
+        """Test that a response cached on disk is reused by a new tool instance."""
+        image_path, _, _ = test_image
+        mock_model_provider.generate_response.return_value = '{"boxes": [{"confidence": 0.92, "xyxy": [0.1, 0.2, 0.3, 0.4]}]}'
+        cache_dir = os.path.join(temp_dir, "detection_cache")
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        first = DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir).execute(tool_use)
+        second = DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir).execute(tool_use)
+        
+        assert mock_model_provider.generate_response.call_count == 1
+        assert second.to_dict() == first.to_dict()
+    
+    def test_disk_cache_misses_when_image_changes(self, test_image, mock_model_provider, temp_dir):
+        """Test that changing the image contents invalidates the on-disk cache."""
+        image_path, width, height = test_image
+        cache_dir = os.path.join(temp_dir, "detection_cache")
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir).execute(tool_use)
+        Image.new('RGB', (width, height), color='black').save(image_path)
+        DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir).execute(tool_use)
+        
+        assert mock_model_provider.generate_response.call_count == 2
+    
+    def test_disk_cache_hit_not_rewritten(self, test_image, mock_model_provider, temp_dir):
+        """Test that a response read from disk isn't written back (which would reset its age)."""
+        image_path, _, _ = test_image
+        cache_dir = os.path.join(temp_dir, "detection_cache")
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir).execute(tool_use)
+        tool = DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir)
+        tool.response_cache.set = Mock()
+        tool.execute(tool_use)
+        
+        assert mock_model_provider.generate_response.call_count == 1
+        tool.response_cache.set.assert_not_called()
+    
+    def test_disk_cache_ttl_expires_entries(self, test_image, mock_model_provider, temp_dir):
+        """Test that responses older than cache_ttl_seconds are fetched again."""
+        image_path, _, _ = test_image
+        cache_dir = os.path.join(temp_dir, "detection_cache")
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir).execute(tool_use)
+        # Age the cached entry past the TTL
+        for name in os.listdir(cache_dir):
+            os.utime(os.path.join(cache_dir, name), (0, 0))
+        DetectBoundingBox(
+            model_provider=mock_model_provider, cache_dir=cache_dir, cache_ttl_seconds=60
+        ).execute(tool_use)
+        
+        assert mock_model_provider.generate_response.call_count == 2
+    
+    def test_disk_cache_key_includes_max_output_tokens(self, test_image, mock_model_provider, temp_dir):
+        """Test that a different output token cap doesn't reuse a cached response."""
+        image_path, _, _ = test_image
+        cache_dir = os.path.join(temp_dir, "detection_cache")
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir, max_output_tokens=256).execute(tool_use)
+        DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir, max_output_tokens=1024).execute(tool_use)
+        DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir, max_output_tokens=1024).execute(tool_use)
+        
+        assert mock_model_provider.generate_response.call_count == 2
+        assert len(os.listdir(cache_dir)) == 2
+    
+    def test_repaired_response_not_cached(self, test_image, mock_model_provider, temp_dir):
+        """Test that a truncated response that needed repair is neither cached in memory nor on disk."""
+        image_path, _, _ = test_image
+        mock_model_provider.generate_response.return_value = (
+            '{"boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2, 0.3, 0.4]}, {"confidence": 0.8'
+        )
+        cache_dir = os.path.join(temp_dir, "detection_cache")
+        tool = DetectBoundingBox(model_provider=mock_model_provider, cache_dir=cache_dir)
+        
+        tool_use = ToolUse(
+            name="detect_bounding_box",
+            params={
+                "image_path": image_path,
+                "label": "button"
+            }
+        )
+        result = tool.execute(tool_use)
+        tool.execute(tool_use)
+        
+        assert len(result.boxes) == 1
+        assert mock_model_provider.generate_response.call_count == 2
+        assert os.listdir(cache_dir) == []
@@ -617,3 +617,12 @@ class TestDrawBoundingBoxHelpers:
         # The current implementation expects #, so this should default to red
         result = tool._hex_to_rgb("FF0000")
         assert result == (255, 0, 0)  # Defaults to red
+    
+    def test_output_path_lock_shared_per_file(self, tmp_path, monkeypatch):
+        """Test that writes to the same output file share one lock and other files get their own."""
+        from tools.draw_bounding_box import draw_bounding_box as draw_module
+        monkeypatch.chdir(tmp_path)
+        
+        lock = draw_module._get_output_path_lock("out.png")
+        assert draw_module._get_output_path_lock(str(tmp_path / "out.png")) is lock
+        assert draw_module._get_output_path_lock("other.png") is not lock
@@ -0,0 +1,237 @@
+"""
+Unit tests for the Gemini client.
+
+This module contains unit tests for:
+- Reuse of loaded image parts
+- Splitting the conversation into chat history and the message being sent
+- Sending the system prompt and tools as a system instruction
+- Generation options (JSON output, output token cap)
+"""
+
+import os
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock, patch
+from PIL import Image
+from core.models import Message, Role
+from providers import gemini
+
+
+@pytest.fixture
+def generative_model(monkeypatch):
+    """Mock the SDK's configure() and GenerativeModel; each GenerativeModel call returns a new model."""
+    import google.generativeai as genai
+    model_class = Mock(side_effect=lambda *args, **kwargs: Mock())
+    monkeypatch.setattr(genai, "configure", Mock())
+    monkeypatch.setattr(genai, "GenerativeModel", model_class)
+    monkeypatch.setattr(gemini, "_configured_api_key", None)
+    return model_class
+
+
+@pytest.fixture
+def client(generative_model):
+    """Create a GeminiClient with the SDK mocked."""
+    return gemini.GeminiClient(api_key="test-key", model_name="test-model")
+
+
+def _make_image(temp_dir, name, color='white'):
+    """Save a small PNG and return its path."""
+    image_path = os.path.join(temp_dir, name)
+    Image.new('RGB', (10, 10), color=color).save(image_path)
+    return image_path
+
+
+class TestLoadImagePart:
+    """Test the GeminiClient._load_image_part image cache."""
+    
+    def test_loads_file_bytes_with_mime_type(self, client, test_image):
+        """Test that a file-based image is sent as its original bytes."""
+        image_path, _, _ = test_image
+        image_part = client._load_image_part(image_path)
+        
+        with open(image_path, 'rb') as f:
+            assert image_part == {"mime_type": "image/png", "data": f.read()}
+    
+    def test_unchanged_file_not_reread(self, client, test_image):
+        """Test that a repeat load of an unmodified file reuses the cached part."""
+        image_path, _, _ = test_image
+        
+        with patch("builtins.open", wraps=open) as mock_open, \
+                patch.object(gemini.Image, "open", wraps=Image.open) as mock_image_open:
+            first = client._load_image_part(image_path)
+            second = client._load_image_part(image_path)
+        
+        assert second is first
+        assert mock_open.call_count == 1
+        assert mock_image_open.call_count == 1
+    
+    def test_rewritten_file_is_reread(self, client, temp_dir):
+        """Test that rewriting the file invalidates the cached part."""
+        image_path = _make_image(temp_dir, "image.png")
+        first = client._load_image_part(image_path)
+        
+        Image.new('RGB', (20, 20), color='black').save(image_path)
+        stat_result = os.stat(image_path)
+        os.utime(image_path, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 1_000_000))
+        
+        with patch("builtins.open", wraps=open) as mock_open:
+            second = client._load_image_part(image_path)
+        
+        assert mock_open.call_count == 1
+        assert second["data"] != first["data"]
+        with open(image_path, 'rb') as f:
+            assert second["data"] == f.read()
+    
+    def test_oldest_entry_evicted_when_full(self, client, temp_dir, monkeypatch):
+        """Test that the cache holds at most MAX_CACHED_IMAGES parts, evicting the oldest first."""
+        monkeypatch.setattr(gemini, "MAX_CACHED_IMAGES", 2)
+        paths = [_make_image(temp_dir, f"image_{i}.png") for i in range(3)]
+        for image_path in paths:
+            client._load_image_part(image_path)
+        
+        cached_paths = [key[0] for key in client._image_parts]
+        assert cached_paths == [os.path.abspath(paths[1]), os.path.abspath(paths[2])]
+        
+        # The evicted image is read again on its next use
+        with patch("builtins.open", wraps=open) as mock_open:
+            client._load_image_part(paths[0])
+        assert mock_open.call_count == 1
+    
+    def test_concurrent_loads_respect_limit(self, client, temp_dir, monkeypatch):
+        """Test that loads from several threads all succeed and the cache stays within its limit."""
+        monkeypatch.setattr(gemini, "MAX_CACHED_IMAGES", 2)
+        paths = [_make_image(temp_dir, f"image_{i}.png") for i in range(8)]
+        
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            image_parts = list(executor.map(client._load_image_part, paths * 4))
+        
+        assert all(part["mime_type"] == "image/png" for part in image_parts)
+        assert len(client._image_parts) <= 2
+
+
+def _chat_model(client):
+    """Return the one model a chat was started on."""
+    models = [client.model, *client._models_by_instruction.values()]
+    chat_models = [model for model in models if model.start_chat.called]
+    assert len(chat_models) == 1
+    return chat_models[0]
+
+
+def _sent_and_history(client):
+    """Return the parts passed to send_message() and the history passed to start_chat()."""
+    model = _chat_model(client)
+    history = model.start_chat.call_args.kwargs["history"]
+    sent_parts = model.start_chat.return_value.send_message.call_args.args[0]
+    return sent_parts, history
+
+
+def _count_part(part, sent_parts, history):
+    """Count how many times a part appears across the sent message and the history."""
+    all_parts = list(sent_parts)
+    for entry in history:
+        all_parts.extend(entry["parts"])
+    return sum(1 for p in all_parts if p == part)
+
+
+class TestGenerateResponse:
+    """Test how GeminiClient.generate_response builds the chat request."""
+    
+    def test_tool_result_sent_once(self, client, test_image):
+        """Test that a trailing tool result is sent as the message and left out of the history."""
+        image_path, _, _ = test_image
+        messages = [
+            Message(role=Role.USER, content="Find the button", image_path=image_path),
+            Message(role=Role.ASSISTANT, content='{"tool_use": "detect_bounding_box"}'),
+            Message(role=Role.ASSISTANT, content="Tool results: []"),
+        ]
+        client.generate_response(messages, system_prompt="System prompt")
+        sent_parts, history = _sent_and_history(client)
+        image_part = client._load_image_part(image_path)
+        
+        assert sent_parts == ["Tool results: []"]
+        assert history == [
+            {"role": "user", "parts": ["Find the button", image_part]},
+            {"role": "model", "parts": ['{"tool_use": "detect_bounding_box"}']},
+        ]
+        assert _count_part("Tool results: []", sent_parts, history) == 1
+        assert _count_part(image_part, sent_parts, history) == 1
+    
+    def test_user_message_and_image_sent_once(self, client, temp_dir):
+        """Test that a trailing user message and its image are sent once, not also in the history."""
+        first_image = _make_image(temp_dir, "first.png", color='white')
+        second_image = _make_image(temp_dir, "second.png", color='black')
+        messages = [
+            Message(role=Role.USER, content="Find the button", image_path=first_image),
+            Message(role=Role.ASSISTANT, content="Found one button."),
+            Message(role=Role.USER, content="Now find the icon", image_path=second_image),
+        ]
+        client.generate_response(messages, system_prompt="System prompt")
+        sent_parts, history = _sent_and_history(client)
+        second_part = client._load_image_part(second_image)
+        
+        assert sent_parts == ["Now find the icon", second_part]
+        assert history == [
+            {"role": "user", "parts": ["Find the button", client._load_image_part(first_image)]},
+            {"role": "model", "parts": ["Found one button."]},
+        ]
+        assert _count_part("Now find the icon", sent_parts, history) == 1
+        assert _count_part(second_part, sent_parts, history) == 1
+    
+    def test_system_prompt_and_tools_sent_as_system_instruction(self, client, generative_model):
+        """Test that the system prompt and tools configure the model instead of the message."""
+        messages = [Message(role=Role.USER, content="Find the button")]
+        client.generate_response(messages, system_prompt="System prompt", tools_description="- tool_a")
+        
+        expected_instruction = "System prompt\n\n\nAvailable tools:\n- tool_a"
+        assert generative_model.call_args_list[-1] == (
+            ("test-model",), {"system_instruction": expected_instruction}
+        )
+        sent_parts, _ = _sent_and_history(client)
+        assert sent_parts == ["Find the button"]
+    
+    def test_model_reused_per_system_instruction(self, client, generative_model):
+        """Test that one model is created per distinct system instruction and then reused."""
+        messages = [Message(role=Role.USER, content="Find the button")]
+        client.generate_response(messages, system_prompt="Prompt A")
+        client.generate_response(messages, system_prompt="Prompt A")
+        client.generate_response(messages, system_prompt="Prompt B")
+        client.generate_response(messages)
+        
+        # The plain model from __init__, then one model per distinct instruction
+        assert generative_model.call_args_list == [
+            (("test-model",), {}),
+            (("test-model",), {"system_instruction": "Prompt A"}),
+            (("test-model",), {"system_instruction": "Prompt B"}),
+        ]
+        assert client._models_by_instruction["Prompt A"].start_chat.call_count == 2
+        assert client._models_by_instruction["Prompt B"].start_chat.call_count == 1
+        assert client.model.start_chat.call_count == 1
+    
+    def test_json_output_sets_response_mime_type(self, client):
+        """Test that json_output asks the API for a JSON response."""
+        messages = [Message(role=Role.USER, content="Find the button")]
+        client.generate_response(messages, json_output=True)
+        
+        send_message = _chat_model(client).start_chat.return_value.send_message
+        assert send_message.call_args.kwargs["generation_config"] == {
+            "response_mime_type": "application/json"
+        }
+    
+    def test_max_output_tokens_sets_generation_config(self, client):
+        """Test that the output token cap is passed to the API, alongside JSON mode."""
+        messages = [Message(role=Role.USER, content="Find the button")]
+        client.generate_response(messages, json_output=True, max_output_tokens=256)
+        
+        send_message = _chat_model(client).start_chat.return_value.send_message
+        assert send_message.call_args.kwargs["generation_config"] == {
+            "response_mime_type": "application/json",
+            "max_output_tokens": 256
+        }
+    
+    def test_no_generation_options_sends_no_config(self, client):
+        """Test that generation_config stays None when no option is set."""
+        messages = [Message(role=Role.USER, content="Find the button")]
+        client.generate_response(messages)
+        
+        send_message = _chat_model(client).start_chat.return_value.send_message
+        assert send_message.call_args.kwargs["generation_config"] is None
@@ -0,0 +1,25 @@
+"""
+Unit tests for the JSON codec helpers.
+
+This module contains unit tests for:
+- Falling back to the standard library for objects orjson rejects
+"""
+
+import json
+import pytest
+from utils.json_codec import json_dumps, json_loads
+
+
+class TestJsonDumps:
+    """Test the json_dumps function."""
+    
+    def test_objects_rejected_by_orjson_still_serialize(self):
+        """Test that wide integers and non-str dict keys serialize as with the standard library."""
+        obj = {"big": 2 ** 70, "nested": {2: "x"}}
+        assert json_loads(json_dumps(obj)) == json.loads(json.dumps(obj))
+        assert json_loads(json_dumps(obj, pretty=True, sort_keys=True)) == json.loads(json.dumps(obj))
+    
+    def test_unserializable_object_raises_type_error(self):
+        """Test that objects neither encoder accepts raise TypeError."""
+        with pytest.raises(TypeError):
+            json_dumps({"a": object()})
@@ -0,0 +1,66 @@
+"""
+Unit tests for the JSON repair utility.
+
+This module contains unit tests for:
+- Stripping prose and markdown fences around JSON
+- Closing truncated documents
+- Trailing commas and Python-style literals
+"""
+
+import json
+from utils.json_repair import repair_json, repair_json_with_status
+
+
+class TestRepairJson:
+    """Test the repair_json function."""
+    
+    def test_valid_json_unchanged(self):
+        """Test that valid JSON passes through unchanged."""
+        text = '{"boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2, 0.3, 0.4]}]}'
+        assert repair_json(text) == text
+    
+    def test_strips_prose_and_fences(self):
+        """Test that text before and after the JSON document is dropped."""
+        text = 'Here is your JSON:\n```json\n{"boxes": []}\n```\nLet me know if you need {more}.'
+        assert json.loads(repair_json(text)) == {"boxes": []}
+    
+    def test_closes_truncated_document(self):
+        """Test that unclosed strings, arrays and objects are closed."""
+        assert json.loads(repair_json('{"boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2')) == {
+            "boxes": [{"confidence": 0.9, "xyxy": [0.1, 0.2]}]
+        }
+        assert json.loads(repair_json('{"label": "unterminated')) == {"label": "unterminated"}
+        assert json.loads(repair_json('{"boxes":')) == {"boxes": None}
+    
+    def test_drops_partial_tokens_and_dangling_keys(self):
+        """Test truncation cut points that leave a partial key or number."""
+        box = '{"confidence": 0.9, "xyxy": [0.1, 0.2, 0.3, 0.4]}'
+        # Cut mid-key
+        assert json.loads(repair_json('{"boxes": [' + box + ', {"conf')) == {
+            "boxes": [json.loads(box), {}]
+        }
+        # Cut after a key
+        assert json.loads(repair_json('{"confidence": 0.9, "xy')) == {"confidence": 0.9}
+        assert json.loads(repair_json('{"confidence": 0.9, "xyxy"')) == {"confidence": 0.9}
+        # Cut mid-number
+        assert json.loads(repair_json('{"xyxy": [0.1, 0.')) == {"xyxy": [0.1]}
+        assert json.loads(repair_json('{"a": -')) == {"a": None}
+        assert json.loads(repair_json('{"a": 1e')) == {"a": None}
+        # String values are kept
+        assert json.loads(repair_json('{"a": "x", "b": "partial')) == {"a": "x", "b": "partial"}
+    
+    def test_trailing_commas_and_python_literals(self):
+        """Test that trailing commas are removed and Python literals are translated outside strings."""
+        text = '{"a": None, "b": True, "c": False, "d": "None", "e": [1, 2,],}'
+        assert json.loads(repair_json(text)) == {"a": None, "b": True, "c": False, "d": "None", "e": [1, 2]}
+    
+    def test_reports_truncation(self):
+        """Test that repair_json_with_status reports whether anything had to be closed."""
+        assert repair_json_with_status('{"a": [1, 2,],}') == ('{"a": [1, 2]}', False)
+        assert repair_json_with_status('{"a": [1, 2') == ('{"a": [1, 2]}', True)
+        assert repair_json_with_status('{"a": "b') == ('{"a": "b"}', True)
+        assert repair_json_with_status("no json") == ("no json", False)
+    
+    def test_no_json_returns_stripped_text(self):
+        """Test that text without an object or array is returned stripped."""
+        assert repair_json("  no json here  ") == "no json here"
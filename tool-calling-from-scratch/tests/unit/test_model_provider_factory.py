@@ -0,0 +1,46 @@
+"""
+Unit tests for the model provider factory.
+
+This module contains unit tests for:
+- Reuse of provider instances per client and model
+- Unsupported client handling
+"""
+
+import pytest
+from unittest.mock import Mock
+from providers import factory
+
+
+@pytest.fixture
+def mock_gemini_provider_class(monkeypatch):
+    """Replace GeminiModelProvider with a mock and start from an empty provider cache."""
+    provider_class = Mock(side_effect=lambda model_name: Mock(model_name=model_name))
+    monkeypatch.setattr(factory, "GeminiModelProvider", provider_class)
+    monkeypatch.setattr(factory, "_provider_cache", {})
+    return provider_class
+
+
+class TestCreateModelProvider:
+    """Test the create_model_provider factory."""
+
+    def test_same_model_returns_shared_provider(self, mock_gemini_provider_class):
+        """Test that repeated calls for the same model reuse one provider."""
+        first = factory.create_model_provider("gemini", model_name="model-a")
+        second = factory.create_model_provider("Gemini", model_name="model-a")
+
+        assert first is second
+        assert mock_gemini_provider_class.call_count == 1
+
+    def test_different_models_get_separate_providers(self, mock_gemini_provider_class):
+        """Test that different model names produce different providers."""
+        first = factory.create_model_provider("gemini", model_name="model-a")
+        second = factory.create_model_provider("gemini", model_name="model-b")
+
+        assert first is not second
+        assert first.model_name == "model-a"
+        assert second.model_name == "model-b"
+
+    def test_unsupported_client_raises_error(self, mock_gemini_provider_class):
+        """Test that an unknown client name raises ValueError."""
+        with pytest.raises(ValueError, match="Unsupported client"):
+            factory.create_model_provider("unknown")
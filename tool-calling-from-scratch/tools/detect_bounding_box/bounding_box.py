@@ -5,6 +5,8 @@ from dataclasses import dataclass
 @dataclass
 class BoundingBox:
     """Represents a single detected bounding box."""
+    __slots__ = ("confidence", "xyxy")
+    
     confidence: float
     xyxy: List[float]  # [x1, y1, x2, y2] in normalized coordinates (0.0 to 1.0)
     
@@ -1,26 +1,97 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
+import hashlib
 import json
+import logging
+import os
 import re
 from PIL import Image
 from core.tool import Tool, ToolUse
 from core.models import Message, Role
 from providers.factory import create_model_provider
 from providers.base import ModelProvider
+from utils.json_codec import json_loads
+from utils.json_repair import repair_json_with_status
+from utils.response_cache import ResponseCache
 from .bounding_box_input import BoundingBoxInput
 from .bounding_box import BoundingBox
 from .bounding_box_output import BoundingBoxOutput
 
+logger = logging.getLogger(__name__)
+
+# JSON object inside a markdown code block, compiled once at import
+FENCED_JSON_PATTERN = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+
+
+# System prompt for the detection model call. It does not depend on the request, so it
+# lives at module level (like SYSTEM_PROMPT) and every call sends the identical text.
+DETECTION_PROMPT = """You are a computer vision assistant that detects bounding boxes around specific objects in images.
+
+Your task is to analyze an image and detect all instances of a specified label/class, returning their bounding box coordinates.
+All bounding box coordinates MUST be normalized floats between 0.0 and 1.0, relative to the image width and height.
+
+CRITICAL DETECTION RULES:
+1. ONLY detect objects that directly match the requested label - do NOT detect surrounding context, containers, or related objects
+3. For objects: detect the ENTIRE object including all edges, corners, and extensions
+4. Verify each detection actually matches the requested label before including it
+
+You must respond with valid JSON only (no markdown, no extra prose). The response must follow this exact format:
+
+{
+  "boxes": [
+    {
+      "confidence": <confidence_score_0.0_to_1.0>,
+      "xyxy": [x1, y1, x2, y2]
+    }
+  ]
+}
+
+Rules:
+- boxes is an array of all detected instances of the specified label
+- Each box must have:
+  - confidence: A float MUST be between 0.0 and 1.0 representing detection confidence (use lower confidence if you're less certain)
+  - xyxy: An array of exactly 4 floats [x1, y1, x2, y2] where:
+    - (x1, y1) is the top-left corner of the bounding box
+    - (x2, y2) is the bottom-right corner of the bounding box
+    - Coordinates are normalized (0.0 to 1.0), where 0.0 is the left/top edge and 1.0 is the right/bottom edge of the image
+- CRITICAL: The bounding box must fully contain the entire visible extent of the target object without cutting off any part
+- For humans/people/persons: the box MUST extend from the top of the head to the bottom of visible feet/legs, and include full width of body and limbs
+- Only include objects that match the requested label - do NOT include containers, vehicles, or context around the object
+- If no instances are found, return an empty boxes array: "boxes": []
+- Do not include any text outside the JSON
+- All values must be valid JSON (numbers, arrays, objects)
+
+The label to detect will be specified in the user's request."""
+
 
 class DetectBoundingBox(Tool):
     """Tool for detecting bounding boxes around items in images."""
     
-    def __init__(self, model_provider: Optional[ModelProvider] = None, model_name: str = "gemini-3-flash-preview"):
+    def __init__(
+        self,
+        model_provider: Optional[ModelProvider] = None,
+        model_name: str = "gemini-3-flash-preview",
+        cache_results: bool = True,
+        cache_dir: Optional[str] = None,
+        max_output_tokens: Optional[int] = None,
+        cache_ttl_seconds: Optional[float] = None
+    ):
         """
         Initialize the DetectBoundingBox tool.
         
         Args:
             model_provider: Optional ModelProvider instance. If not provided, will create a Gemini provider.
             model_name: Name of the model to use (default: "gemini-3-flash-preview")
+            cache_results: Whether to reuse a previous detection when the same label is requested
+                for the same, unmodified image file (default: True)
+            cache_dir: Optional directory for a persistent cache of model responses, keyed by
+                model, prompt, label and image contents, so repeated runs skip the API call.
+                If None, responses are not cached on disk.
+            max_output_tokens: Optional cap on tokens generated per detection. Detection replies
+                are small JSON objects, so a cap bounds latency on runaway output. If None, the
+                provider's default limit applies.
+            cache_ttl_seconds: Optional maximum age in seconds of a response in the cache_dir
+                cache. Older responses are fetched from the model again. If None, cached
+                responses never expire.
         """
         parameters = {
             "image_path": {
@@ -41,6 +112,13 @@ class DetectBoundingBox(Tool):
         )
         # Initialize model provider if not provided
         self.model_provider = model_provider or create_model_provider("gemini", model_name=model_name)
+        self.model_name = model_name
+        self.max_output_tokens = max_output_tokens
+        
+        # Detection results keyed by (absolute image path, mtime_ns, file size, label)
+        self.cache_results = cache_results
+        self._detection_cache: Dict[Tuple[str, int, int, str], BoundingBoxOutput] = {}
+        self.response_cache = ResponseCache(cache_dir, ttl_seconds=cache_ttl_seconds) if cache_dir else None
     
     def get_prompt_for_orchestrator(self) -> str:
         """
@@ -83,72 +161,112 @@ The output contains:
         Returns:
             A string with instructions for bounding box detection
         """
-        return """You are a computer vision assistant that detects bounding boxes around specific objects in images.
-
-Your task is to analyze an image and detect all instances of a specified label/class, returning their bounding box coordinates.
-All bounding box coordinates MUST be normalized floats between 0.0 and 1.0, relative to the image width and height.
-
-CRITICAL DETECTION RULES:
-1. ONLY detect objects that directly match the requested label - do NOT detect surrounding context, containers, or related objects
-3. For objects: detect the ENTIRE object including all edges, corners, and extensions
-4. Verify each detection actually matches the requested label before including it
-
-You must respond with valid JSON only (no markdown, no extra prose). The response must follow this exact format:
-
-{
-  "boxes": [
-    {
-      "confidence": <confidence_score_0.0_to_1.0>,
-      "xyxy": [x1, y1, x2, y2]
-    }
-  ]
-}
-
-Rules:
-- boxes is an array of all detected instances of the specified label
-- Each box must have:
-  - confidence: A float MUST be between 0.0 and 1.0 representing detection confidence (use lower confidence if you're less certain)
-  - xyxy: An array of exactly 4 floats [x1, y1, x2, y2] where:
-    - (x1, y1) is the top-left corner of the bounding box
-    - (x2, y2) is the bottom-right corner of the bounding box
-    - Coordinates are normalized (0.0 to 1.0), where 0.0 is the left/top edge and 1.0 is the right/bottom edge of the image
-- CRITICAL: The bounding box must fully contain the entire visible extent of the target object without cutting off any part
-- For humans/people/persons: the box MUST extend from the top of the head to the bottom of visible feet/legs, and include full width of body and limbs
-- Only include objects that match the requested label - do NOT include containers, vehicles, or context around the object
-- If no instances are found, return an empty boxes array: "boxes": []
-- Do not include any text outside the JSON
-- All values must be valid JSON (numbers, arrays, objects)
-
-The label to detect will be specified in the user's request."""
+        return DETECTION_PROMPT
     
-    def _extract_json_from_response(self, response_text: str) -> Dict[str, Any]:
+    def _extract_json_from_response(self, response_text: str) -> Tuple[Dict[str, Any], bool]:
         """
-        Extract JSON from the LLM response, handling markdown code blocks if present.
+        Extract JSON from the LLM response, handling markdown code blocks if present
+        and falling back to repairing malformed or truncated JSON.
         
         Args:
             response_text: Raw response text from the LLM
             
         Returns:
-            Parsed JSON dictionary
+            Tuple of (parsed JSON dictionary, whether the response only parsed after repair)
         """
-        # Try to find JSON in markdown code blocks first
-        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_text, re.DOTALL)
+        # Fast path: in JSON mode the response is normally a bare object, so parse it
+        # directly without scanning for fences or slicing out a span
+        stripped = response_text.strip()
+        if stripped.startswith('{') and stripped.endswith('}'):
+            try:
+                return json_loads(stripped), False
+            except json.JSONDecodeError:
+                pass
+        
+        # Try to find JSON in markdown code blocks first (only scan for a fenced block
+        # when a fence is actually present, which JSON-only responses usually lack)
+        json_match = None
+        if '```' in response_text:
+            json_match = FENCED_JSON_PATTERN.search(response_text)
         if json_match:
             json_str = json_match.group(1)
         else:
-            # Try to find JSON object directly
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(0)
+            # Try to find JSON object directly (first '{' to last '}', same span as a
+            # greedy regex but found with two plain substring scans)
+            start = response_text.find('{')
+            end = response_text.rfind('}')
+            if start != -1 and end > start:
+                json_str = response_text[start:end + 1]
             else:
                 # If no JSON found, try parsing the whole response
                 json_str = response_text.strip()
         
         # Parse JSON
         try:
-            return json.loads(json_str)
+            return json_loads(json_str), False
         except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse JSON from response: {e}\nResponse was: {response_text[:500]}")
+            parse_error = e
+        
+        # Last resort: repair the whole response (e.g. output truncated at the token limit)
+        repaired_text, truncated = repair_json_with_status(response_text)
+        try:
+            data = json_loads(repaired_text)
+        except json.JSONDecodeError:
+            raise ValueError(f"Failed to parse JSON from response: {parse_error}\nResponse was: {response_text[:500]}")
+        if not isinstance(data, dict):
+            raise ValueError(f"Failed to parse JSON from response: expected a JSON object\nResponse was: {response_text[:500]}")
+        
+        # A truncated response ends in a box whose closing '}' never arrived (its last
+        # coordinate or confidence may be cut short), so drop it and keep the rest
+        boxes = data.get("boxes")
+        if truncated and isinstance(boxes, list) and boxes:
+            boxes.pop()
+        return data, True
+    
+    def _get_cache_key(self, input_data: BoundingBoxInput) -> Optional[Tuple[str, int, int, str]]:
+        """
+        Build the detection cache key for an input.
+        
+        The file's modification time and size are part of the key, so editing or
+        replacing the image invalidates earlier results without hashing its contents.
+        
+        Args:
+            input_data: Parsed input parameters
+            
+        Returns:
+            Cache key tuple, or None if the image file can't be stat'ed
+        """
+        try:
+            stat_result = os.stat(input_data.image_path)
+        except OSError:
+            return None
+        return (
+            os.path.abspath(input_data.image_path),
+            stat_result.st_mtime_ns,
+            stat_result.st_size,
+            input_data.label
+        )
+    
+    def _get_response_cache_key(self, input_data: BoundingBoxInput, user_message_content: str) -> str:
+        """
+        Build the on-disk response cache key for a detection request.
+        
+        Args:
+            input_data: Parsed input parameters
+            user_message_content: Text of the user message sent to the model
+            
+        Returns:
+            Cache key string
+        """
+        with open(input_data.image_path, 'rb') as f:
+            image_digest = hashlib.sha256(f.read()).hexdigest()
+        return ResponseCache.make_key({
+            "model": self.model_name,
+            "max_output_tokens": self.max_output_tokens,
+            "system": self._get_detection_prompt(),
+            "user": user_message_content,
+            "image_sha256": image_digest
+        })
     
     def execute(self, tool_use: ToolUse) -> BoundingBoxOutput:
         """
@@ -175,6 +293,12 @@ The label to detect will be specified in the user's request."""
         if not input_data.label:
             raise ValueError("label parameter is required")
         
+        # Reuse an earlier detection of the same label on the same, unmodified image
+        cache_key = self._get_cache_key(input_data) if self.cache_results else None
+        if cache_key is not None and cache_key in self._detection_cache:
+            logger.info("Using cached bounding boxes for label '%s' in image '%s'", input_data.label, input_data.image_path)
+            return self._detection_cache[cache_key]
+        
         # Load image to get dimensions and verify it exists
         try:
             image = Image.open(input_data.image_path)
@@ -182,7 +306,7 @@ The label to detect will be specified in the user's request."""
         except Exception as e:
             raise ValueError(f"Failed to load image from {input_data.image_path}: {e}")
         
-        print(f"Detecting bounding boxes for label '{input_data.label}' in image '{input_data.image_path}'")
+        logger.info("Detecting bounding boxes for label '%s' in image '%s'", input_data.label, input_data.image_path)
         
         # Create user message with image and label request
         user_message_content = f"Detect all instances of '{input_data.label}' in this image and return bounding boxes."
@@ -192,19 +316,30 @@ The label to detect will be specified in the user's request."""
             image_path=input_data.image_path
         )
         
+        # Check the on-disk cache before calling the model
+        response_cache_key = None
+        response_text = None
+        if self.response_cache is not None:
+            response_cache_key = self._get_response_cache_key(input_data, user_message_content)
+            response_text = self.response_cache.get(response_cache_key)
+        from_cache = response_text is not None
+        
         # Call Gemini with bounding box detection prompt
-        try:
-            response_text = self.model_provider.generate_response(
-                messages=[user_message],
-                system_prompt=self._get_detection_prompt(),
-                tools_description=None
-            )
-        except Exception as e:
-            raise RuntimeError(f"Failed to call Gemini API: {e}")
+        if not from_cache:
+            try:
+                response_text = self.model_provider.generate_response(
+                    messages=[user_message],
+                    system_prompt=self._get_detection_prompt(),
+                    tools_description=None,
+                    json_output=True,
+                    max_output_tokens=self.max_output_tokens
+                )
+            except Exception as e:
+                raise RuntimeError(f"Failed to call Gemini API: {e}")
         
         # Parse JSON response
         try:
-            response_dict = self._extract_json_from_response(response_text)
+            response_dict, repaired = self._extract_json_from_response(response_text)
         except ValueError as e:
             raise ValueError(f"Failed to parse bounding box response: {e}")
         
@@ -223,8 +358,19 @@ The label to detect will be specified in the user's request."""
                 xyxy=[float(x) for x in box_dict["xyxy"]]
             ))
         
-        return BoundingBoxOutput(
+        output = BoundingBoxOutput(
             width=image_width,
             height=image_height,
             boxes=boxes
         )
+        
+        # Only successful detections are cached; failures are retried on the next call. A
+        # response that needed repair (e.g. cut off at max_output_tokens) isn't cached either,
+        # so a later call can get the complete result
+        if cache_key is not None and not repaired:
+            self._detection_cache[cache_key] = output
+        # Responses read from disk aren't written back, so a hit doesn't reset the entry's age
+        if response_cache_key is not None and not from_cache and not repaired:
+            self.response_cache.set(response_cache_key, response_text)
+        
+        return output
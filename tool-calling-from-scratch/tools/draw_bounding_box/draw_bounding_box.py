@@ -1,4 +1,7 @@
 from typing import Any, Dict, List, Optional, Union
+import logging
+import os
+import threading
 from PIL import Image, ImageDraw, ImageFont
 from core.tool import Tool, ToolUse
 from tools.detect_bounding_box import BoundingBoxOutput, BoundingBox
@@ -6,6 +9,39 @@ from utils.request_context import get_request_id
 from .draw_bounding_box_input import DrawBoundingBoxInput
 from .draw_bounding_box_output import DrawBoundingBoxOutput
 
+logger = logging.getLogger(__name__)
+
+# Per-output-path locks, so concurrent draws to the same file (the agent runs the tool uses
+# from one response on a thread pool) write it one at a time instead of interleaving
+_output_path_locks: Dict[str, threading.Lock] = {}
+_output_path_locks_guard = threading.Lock()
+
+
+# Common color names mapping, built once instead of on every color lookup
+COLOR_MAP = {
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255),
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "orange": (255, 165, 0),
+    "purple": (128, 0, 128),
+    "pink": (255, 192, 203),
+}
+
+
+def _get_output_path_lock(output_path: str) -> threading.Lock:
+    """Return the lock that serializes writes to an output path."""
+    key = os.path.abspath(output_path)
+    with _output_path_locks_guard:
+        lock = _output_path_locks.get(key)
+        if lock is None:
+            lock = _output_path_locks[key] = threading.Lock()
+        return lock
+
 
 class DrawBoundingBox(Tool):
     """Tool for drawing bounding boxes on images."""
@@ -142,31 +178,25 @@ The output contains:
         Returns:
             List of BoundingBox objects
         """
-        boxes = []
-        
         # Check if it's a BoundingBoxOutput format
         if isinstance(boxes_data, dict) and "boxes" in boxes_data:
             # It's a BoundingBoxOutput dict
-            for box_dict in boxes_data["boxes"]:
-                if "xyxy" not in box_dict:
-                    continue
-                boxes.append(BoundingBox(
-                    confidence=float(box_dict.get("confidence", 1.0)),
-                    xyxy=[float(x) for x in box_dict["xyxy"]]
-                ))
+            box_dicts = boxes_data["boxes"]
         elif isinstance(boxes_data, list):
             # It's a list of box dicts
-            for box_dict in boxes_data:
-                if "xyxy" not in box_dict:
-                    continue
-                boxes.append(BoundingBox(
-                    confidence=float(box_dict.get("confidence", 1.0)),
-                    xyxy=[float(x) for x in box_dict["xyxy"]]
-                ))
+            box_dicts = boxes_data
         else:
             raise ValueError(f"Invalid boxes format. Expected dict with 'boxes' key or list of box dicts. Got: {type(boxes_data)}")
         
-        return boxes
+        # Boxes without coordinates are skipped
+        return [
+            BoundingBox(
+                confidence=float(box_dict.get("confidence", 1.0)),
+                xyxy=[float(x) for x in box_dict["xyxy"]]
+            )
+            for box_dict in box_dicts
+            if "xyxy" in box_dict
+        ]
     
     def _get_output_path(self, input_path: str, output_path: Optional[str] = None) -> str:
         """
@@ -222,24 +252,10 @@ The output contains:
         Returns:
             RGB tuple (r, g, b)
         """
-        # Common color names mapping
-        color_map = {
-            "red": (255, 0, 0),
-            "green": (0, 255, 0),
-            "blue": (0, 0, 255),
-            "yellow": (255, 255, 0),
-            "cyan": (0, 255, 255),
-            "magenta": (255, 0, 255),
-            "white": (255, 255, 255),
-            "black": (0, 0, 0),
-            "orange": (255, 165, 0),
-            "purple": (128, 0, 128),
-            "pink": (255, 192, 203),
-        }
-        
         # Check if it's a color name
-        if color.lower() in color_map:
-            return color_map[color.lower()]
+        rgb = COLOR_MAP.get(color.lower())
+        if rgb is not None:
+            return rgb
         
         # Check if it's a hex code
         if color.startswith("#"):
@@ -308,24 +324,31 @@ The output contains:
         draw_image = image.copy()
         draw = ImageDraw.Draw(draw_image)
         
+        # Label font and text color are the same for every box, so set them up once
+        font = None
+        text_color = None
+        if input_data.draw_labels:
+            # Try to load a font, fallback to default if not available
+            try:
+                # Try to use a default font
+                font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 16)
+            except:
+                try:
+                    font = ImageFont.load_default()
+                except:
+                    font = None
+            text_color = (255, 255, 255) if sum(color_rgb) < 384 else (0, 0, 0)  # White or black based on background
+        
         # Draw each bounding box
         for i, box in enumerate(boxes):
             x1, y1, x2, y2 = box.xyxy
             
             # Convert normalized coordinates (0.0 to 1.0) to pixel coordinates
-            # Check if coordinates are normalized (all between 0.0 and 1.0)
-            if all(0.0 <= coord <= 1.0 for coord in [x1, y1, x2, y2]):
-                # Coordinates are normalized, convert to pixels
-                x1 = int(x1 * width)
-                y1 = int(y1 * height)
-                x2 = int(x2 * width)
-                y2 = int(y2 * height)
-            else:
-                # Assume coordinates are already in pixel format (for backward compatibility)
-                x1 = int(x1)
-                y1 = int(y1)
-                x2 = int(x2)
-                y2 = int(y2)
+            # (BoundingBox already rejected anything outside that range when the boxes were parsed)
+            x1 = int(x1 * width)
+            y1 = int(y1 * height)
+            x2 = int(x2 * width)
+            y2 = int(y2 * height)
             
             # Draw rectangle
             draw.rectangle(
@@ -344,16 +367,6 @@ The output contains:
                 else:
                     label = f"{box.confidence:.2f}" if box.confidence < 1.0 else f"Box {i+1}"
                 
-                # Try to load a font, fallback to default if not available
-                try:
-                    # Try to use a default font
-                    font = ImageFont.truetype("/System/Library/Fonts/Helvetica.ttc", 16)
-                except:
-                    try:
-                        font = ImageFont.load_default()
-                    except:
-                        font = None
-                
                 # Calculate text size
                 if font:
                     bbox = draw.textbbox((0, 0), label, font=font)
@@ -373,7 +386,6 @@ The output contains:
                 )
                 
                 # Draw label text
-                text_color = (255, 255, 255) if sum(color_rgb) < 384 else (0, 0, 0)  # White or black based on background
                 draw.text(
                     (x1 + 2, label_y + 2),
                     label,
@@ -383,9 +395,10 @@ The output contains:
         
         # Save the annotated image
         try:
-            draw_image.save(output_path)
+            with _get_output_path_lock(output_path):
+                draw_image.save(output_path)
             request_id = get_request_id()
-            print(f"[Request {request_id}] Drew {len(boxes)} bounding box(es) on image and saved to {output_path}")
+            logger.info("[Request %s] Drew %d bounding box(es) on image and saved to %s", request_id, len(boxes), output_path)
         except Exception as e:
             raise RuntimeError(f"Failed to save annotated image to {output_path}: {e}")
         
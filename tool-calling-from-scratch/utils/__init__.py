@@ -9,6 +9,8 @@ from .request_context import (
     clear_request_id,
     request_id_var
 )
+from .json_codec import json_loads, json_dumps
+from .response_cache import ResponseCache
 
 __all__ = [
     'ConversationLogger',
@@ -16,5 +18,8 @@ __all__ = [
     'set_request_id', 
     'get_request_id',
     'clear_request_id',
-    'request_id_var'
+    'request_id_var',
+    'json_loads',
+    'json_dumps',
+    'ResponseCache'
 ]
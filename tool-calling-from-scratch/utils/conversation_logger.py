@@ -1,12 +1,15 @@
 """
 Conversation history logger for debugging agent interactions.
 """
-import json
+import logging
 import os
 from datetime import datetime
 from typing import List, Optional, Any, Dict
 from uuid import uuid4
 from .request_context import get_request_id
+from .json_codec import json_dumps
+
+logger = logging.getLogger(__name__)
 
 
 class ConversationLogger:
@@ -38,7 +41,9 @@ class ConversationLogger:
             Unique conversation ID
         """
         # Generate unique conversation ID: timestamp + UUID
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # (one clock read, so the ID and started_at always agree)
+        started_at = datetime.now()
+        timestamp = started_at.strftime("%Y%m%d_%H%M%S")
         unique_id = str(uuid4())[:8]
         self.current_conversation_id = f"{timestamp}_{unique_id}"
         self.current_request_id = request_id or get_request_id()
@@ -46,7 +51,7 @@ class ConversationLogger:
         # Initialize conversation data
         self.conversation_data = {
             "conversation_id": self.current_conversation_id,
-            "started_at": datetime.now().isoformat(),
+            "started_at": started_at.isoformat(),
             "initial_request_id": self.current_request_id,
             "messages": [],
             "tool_executions": [],
@@ -156,10 +161,14 @@ class ConversationLogger:
         filepath = os.path.join(self.output_dir, filename)
         
         try:
+            # Serialize up front so the file is written with a single call instead of
+            # one small write per JSON chunk, and a serialization error can't leave a
+            # truncated file behind
+            content = json_dumps(self.conversation_data, pretty=True)
             with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.conversation_data, f, indent=2, ensure_ascii=False)
+                f.write(content)
         except Exception as e:
-            print(f"Warning: Failed to save conversation history: {e}")
+            logger.warning("Failed to save conversation history: %s", e)
     
     def reset(self):
         """Reset the logger for a new conversation."""
@@ -0,0 +1,64 @@
+"""
+JSON encoding and decoding helpers.
+
+Uses orjson when it is installed and falls back to the standard library json module otherwise.
+Both paths produce equivalent JSON, but not always the same text: float spellings can differ
+(orjson writes 1e-05 as 0.00001 and 1e+20 as 1e20). Decode errors are json.JSONDecodeError on
+both paths (orjson's decode error is a subclass).
+"""
+import json
+from typing import Any, Union
+
+# Try to use orjson if available
+try:
+    import orjson
+except ImportError:
+    orjson = None  # orjson not installed, will use the standard library json module only
+
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse a JSON document.
+
+    Args:
+        data: JSON text as str or UTF-8 encoded bytes
+
+    Returns:
+        The decoded Python object
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any, pretty: bool = False, sort_keys: bool = False) -> str:
+    """
+    Serialize an object to JSON text.
+
+    Args:
+        obj: JSON-serializable object
+        pretty: If True, indent with 2 spaces; otherwise emit compact JSON without whitespace
+        sort_keys: If True, emit dictionary keys in sorted order (e.g. for stable hashing)
+
+    Returns:
+        JSON text, with non-ASCII characters left unescaped
+
+    Raises:
+        TypeError: If the object is not serializable by the standard library json module
+    """
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, option=option).decode("utf-8")
+        except TypeError:
+            # orjson rejects some objects the standard library accepts (integers wider
+            # than 64 bits, non-str dict keys), so let the standard library try
+            pass
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False, sort_keys=sort_keys)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, sort_keys=sort_keys)
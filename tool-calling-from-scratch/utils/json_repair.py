@@ -0,0 +1,168 @@
+"""
+Best-effort repair of malformed JSON returned by LLMs.
+"""
+import re
+from typing import Tuple
+
+# Python literals that models sometimes emit in place of their JSON spellings
+_PYTHON_LITERALS = {"None": "null", "True": "true", "False": "false"}
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+# Characters that end a bare token (number or literal) in the output buffer
+_TOKEN_DELIMITERS = frozenset('{}[],:"')
+
+_NUMBER_PATTERN = re.compile(r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?')
+
+
+def _strip_trailing_comma(out: list):
+    """Remove a trailing comma (and whitespace after it) from the output buffer."""
+    i = len(out) - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] == ",":
+        del out[i:]
+
+
+def _strip_trailing_whitespace(out: list):
+    """Remove trailing whitespace from the output buffer."""
+    while out and out[-1].isspace():
+        out.pop()
+
+
+def _drop_partial_token(out: list):
+    """Remove a trailing bare token cut short by truncation (e.g. '0.', '-', '1e', 'tru')."""
+    i = len(out)
+    while i > 0 and out[i - 1] not in _TOKEN_DELIMITERS and not out[i - 1].isspace():
+        i -= 1
+    token = "".join(out[i:])
+    if token and token not in _PYTHON_LITERALS.values() and not _NUMBER_PATTERN.fullmatch(token):
+        del out[i:]
+        _strip_trailing_whitespace(out)
+
+
+def _drop_dangling_key(out: list, string_start: int):
+    """Remove an object key that has no ':' or value after it."""
+    i = string_start - 1
+    while i >= 0 and out[i].isspace():
+        i -= 1
+    if i >= 0 and out[i] in ("{", ","):
+        del out[string_start:]
+        _strip_trailing_whitespace(out)
+
+
+def repair_json(text: str) -> str:
+    """
+    Repair common defects in LLM-produced JSON; see repair_json_with_status().
+    
+    Args:
+        text: Raw response text that should contain one JSON object or array
+    
+    Returns:
+        Repaired JSON text, or the stripped input if it contains no '{' or '['
+    """
+    return repair_json_with_status(text)[0]
+
+
+def repair_json_with_status(text: str) -> Tuple[str, bool]:
+    """
+    Repair common defects in LLM-produced JSON in a single pass over the text.
+    
+    Handles:
+    - Prose or markdown fences before the first '{' / '[' and after the matching close
+    - Responses truncated mid-document (unclosed strings, objects and arrays are closed;
+      a partial number or literal, or a key with no value, is dropped)
+    - Trailing commas before '}' / ']'
+    - Python-style None / True / False outside of strings
+    
+    The result is not guaranteed to be valid JSON; callers should still parse it and
+    handle errors.
+    
+    Args:
+        text: Raw response text that should contain one JSON object or array
+    
+    Returns:
+        Tuple of (repaired JSON text, or the stripped input if it contains no '{' or '[';
+        whether the document was truncated, i.e. a string, object or array had to be closed)
+    """
+    out = []
+    stack = []
+    in_string = False
+    escaped = False
+    started = False
+    # Output index of the most recently opened string
+    string_start = 0
+    i = 0
+    n = len(text)
+    
+    while i < n:
+        ch = text[i]
+        
+        if not started:
+            # Skip leading chatter and code fences until the document opens
+            if ch in _CLOSERS:
+                started = True
+                stack.append(_CLOSERS[ch])
+                out.append(ch)
+            i += 1
+            continue
+        
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            i += 1
+            continue
+        
+        if ch == '"':
+            in_string = True
+            string_start = len(out)
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+        elif ch == "}" or ch == "]":
+            _strip_trailing_comma(out)
+            if stack:
+                out.append(stack.pop())
+            if not stack:
+                # Document is complete; ignore anything after it (closing fences, prose)
+                break
+        elif ch.isalpha():
+            # Read a bare word and translate Python literals
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_PYTHON_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    
+    if not started:
+        return text.strip(), False
+    
+    # Close whatever the truncated response left open
+    truncated = in_string or bool(stack)
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    if stack:
+        _strip_trailing_whitespace(out)
+        _drop_partial_token(out)
+        if stack[-1] == "}" and out and out[-1] == '"':
+            _drop_dangling_key(out, string_start)
+        if out and out[-1] == ":":
+            out.append("null")
+        _strip_trailing_comma(out)
+        while stack:
+            out.append(stack.pop())
+    
+    return "".join(out), truncated
@@ -0,0 +1,95 @@
+"""
+On-disk cache for raw LLM responses.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Optional
+from .json_codec import json_loads, json_dumps
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Stores raw model responses on disk, keyed by a hash of everything that shaped the request."""
+    
+    def __init__(self, cache_dir: str, ttl_seconds: Optional[float] = None):
+        """
+        Initialize the response cache.
+        
+        Args:
+            cache_dir: Directory to store cached responses in
+            ttl_seconds: Optional maximum age of a cached response in seconds.
+                Entries older than this are ignored. If None, entries never expire.
+        """
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        
+        # Create cache directory if it doesn't exist
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """
+        Build a cache key for a request.
+        
+        Args:
+            request: JSON-serializable description of the request (model, prompts, inputs)
+        
+        Returns:
+            Hex-encoded SHA-256 digest of the request
+        """
+        payload = json_dumps(request, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _get_path(self, key: str) -> str:
+        """Return the file path for a cache key."""
+        return os.path.join(self.cache_dir, f"{key}.json")
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Cache key from make_key()
+        
+        Returns:
+            The cached response text, or None on a miss, an expired entry, or an unreadable file
+        """
+        filepath = self._get_path(key)
+        try:
+            if self.ttl_seconds is not None and time.time() - os.path.getmtime(filepath) > self.ttl_seconds:
+                return None
+            with open(filepath, 'rb') as f:
+                entry = json_loads(f.read())
+            return entry["response"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+    
+    def set(self, key: str, response: str):
+        """
+        Store a response in the cache.
+        
+        Args:
+            key: Cache key from make_key()
+            response: Raw response text to store
+        """
+        filepath = self._get_path(key)
+        # Write to a temporary file and rename it into place, so a concurrent reader
+        # never sees a partially written entry; each write gets its own temporary file, so
+        # concurrent writers of the same key (e.g. tools on a thread pool) don't share one
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(json_dumps({"response": response}))
+            os.replace(tmp_path, filepath)
+        except OSError as e:
+            logger.warning("Failed to write response cache entry: %s", e)
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass